@@ -25,6 +25,10 @@ class Settings(BaseSettings):
     # AI Configuration
     GOOGLE_API_KEY: str
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"
+    GEMINI_MAX_INFLIGHT: int = 16
+    GEMINI_CACHE_ENABLED: bool = True
+    GEMINI_CACHE_SIZE: int = 4096
+    GEMINI_CACHE_TTL: int = 3600
     LANGCHAIN_API_KEY: str = ""
     LANGCHAIN_TRACING_V2: bool = True
     LANGCHAIN_PROJECT: str = "sarathi-agent"
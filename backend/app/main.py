@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -47,6 +48,16 @@ async def startup_event():
     except Exception as e:
         print(f"⚠️ ChromaDB initialization warning: {e}")
     
+    # Establish the Gemini connection so the first request skips the TLS handshake
+    try:
+        from app.services import gemini_service
+        await asyncio.wait_for(gemini_service.warm_up(), timeout=5)
+        print("✅ Gemini connection warmed up")
+    except asyncio.TimeoutError:
+        print("⚠️ Gemini warm-up warning: timed out, continuing startup")
+    except Exception as e:
+        print(f"⚠️ Gemini warm-up warning: {e}")
+    
     print(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} started")
     print(f"📍 Environment: {'Development' if settings.DEBUG else 'Production'}")
 
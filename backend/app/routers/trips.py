@@ -9,7 +9,7 @@ from app.models.trip import Trip
 from app.auth import get_current_active_user
 from app.schemas.trip import (
     TripCreate, TripResponse, TripUpdate, TripVoiceCreate,
-    TripStats, ZoneRecommendation
+    TripStats, ZoneRecommendation, TripBatchExtractRequest, TripExtraction
 )
 from app.services import gemini_service, google_maps_service, whatsapp_service
 import logging
@@ -194,6 +194,22 @@ async def create_trip_from_voice(
         )
 
 
+@router.post("/batch_extract", response_model=List[TripExtraction])
+async def batch_extract_trips(
+    batch: TripBatchExtractRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Extract trip details from several transcriptions (e.g. end-of-shift uploads)"""
+    
+    try:
+        return await gemini_service.extract_trip_info_batch(batch.transcriptions)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch extraction failed: {str(e)}"
+        )
+
+
 @router.get("", response_model=List[TripResponse])
 async def get_trips(
     skip: int = 0,
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.vehicle import Vehicle, VehicleHealthCheck
@@ -13,12 +13,40 @@ from app.schemas.vehicle import (
 )
 from app.services import gemini_service
 import aiofiles
+import logging
 import os
 from datetime import datetime
 from app.config import settings
 
 router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
+logger = logging.getLogger(__name__)
+_warned_not_preprocessed = False
+
+
+def images_preprocessed(
+    x_image_preprocessed: Optional[str] = Header(None)
+) -> bool:
+    """Whether the client claims to have resized images (X-Image-Preprocessed: jpeg,1024,q82)
+    
+    Only a hint: the service still verifies every image and normalizes any that fail.
+    """
+    global _warned_not_preprocessed
+    
+    if x_image_preprocessed:
+        parts = [p.strip().lower() for p in x_image_preprocessed.split(',')]
+        if len(parts) >= 2 and parts[0] == 'jpeg' and parts[1].isdigit() and int(parts[1]) <= 1024:
+            return True
+    
+    if not _warned_not_preprocessed:
+        _warned_not_preprocessed = True
+        logger.warning(
+            "Vehicle images uploaded without a valid X-Image-Preprocessed header; "
+            "resizing on the server. Clients should send JPEGs of at most 1024px with "
+            "'X-Image-Preprocessed: jpeg,1024,q82'."
+        )
+    return False
+
 
 @router.post("", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
 async def create_vehicle(
@@ -134,6 +162,7 @@ async def create_health_check_with_images(
     images: List[UploadFile] = File(...),
     check_type: str = "image_diagnostic",
     odometer_reading: float = 0,
+    preprocessed: bool = Depends(images_preprocessed),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -178,7 +207,8 @@ async def create_health_check_with_images(
     try:
         analysis = await gemini_service.analyze_vehicle_images(
             image_bytes_list,
-            context=f"Vehicle: {vehicle.make} {vehicle.model}, Odometer: {odometer_reading or vehicle.current_odometer_km}km"
+            context=f"Vehicle: {vehicle.make} {vehicle.model}, Odometer: {odometer_reading or vehicle.current_odometer_km}km",
+            preprocessed=preprocessed
         )
         
         # Create health check record
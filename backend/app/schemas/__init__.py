@@ -1,7 +1,7 @@
 from app.schemas.user import UserCreate, UserResponse, UserLogin, UserUpdate, Token
 from app.schemas.trip import (
     TripCreate, TripResponse, TripUpdate, TripVoiceCreate, 
-    TripStats, ZoneRecommendation
+    TripStats, ZoneRecommendation, TripBatchExtractRequest, TripExtraction
 )
 from app.schemas.vehicle import (
     VehicleCreate, VehicleResponse, VehicleUpdate,
@@ -22,6 +22,7 @@ from app.schemas.investment import (
 __all__ = [
     "UserCreate", "UserResponse", "UserLogin", "UserUpdate", "Token",
     "TripCreate", "TripResponse", "TripUpdate", "TripVoiceCreate", "TripStats", "ZoneRecommendation",
+    "TripBatchExtractRequest", "TripExtraction",
     "VehicleCreate", "VehicleResponse", "VehicleUpdate",
     "VehicleHealthCheckCreate", "VehicleHealthCheckResponse", "VehicleHealthCheckUpdate", "DiagnosticResult",
     "AlertCreate", "AlertResponse", "AlertUpdate", "AlertStats",
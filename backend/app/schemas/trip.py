@@ -30,6 +30,22 @@ class TripVoiceCreate(BaseModel):
     transcription: Optional[str] = None
 
 
+class TripBatchExtractRequest(BaseModel):
+    transcriptions: List[str] = Field(..., min_length=1, max_length=50)
+
+
+class TripExtraction(BaseModel):
+    start_location: Optional[str] = None
+    end_location: Optional[str] = None
+    earnings: float = 0.0
+    fuel_cost: float = 0.0
+    toll_cost: float = 0.0
+    other_expenses: float = 0.0
+    platform: Optional[str] = None
+    trip_type: Optional[str] = "ride_hailing"
+    notes: Optional[str] = None
+
+
 class TripResponse(TripBase):
     id: int
     user_id: int
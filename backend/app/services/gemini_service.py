@@ -1,56 +1,270 @@
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from app.config import settings
 from typing import Optional, List, Dict, Any
+from cachetools import TTLCache
 import base64
+import hashlib
 import logging
+import orjson
 import re
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import io
+import os
+
+try:
+    import pyvips
+except (ImportError, OSError):  # OSError when the libvips shared library is missing
+    pyvips = None
+
+logger = logging.getLogger(__name__)
 
 # Configure Gemini
 genai.configure(api_key=settings.GOOGLE_API_KEY)
 
+# Bound concurrent Gemini calls so bursts stay within the API's QPM limits
+_GEMINI_SEM = asyncio.Semaphore(settings.GEMINI_MAX_INFLIGHT)
 
-class GeminiService:
-    """Service for interacting with Google Gemini AI"""
+
+def _with_backoff(max_tries: int = 5, base: float = 0.5):
+    """Retry a Gemini call on 429 (ResourceExhausted) with jittered exponential backoff"""
+    return retry(
+        retry=retry_if_exception_type(ResourceExhausted),
+        wait=wait_exponential_jitter(initial=base),
+        stop=stop_after_attempt(max_tries),
+        reraise=True,
+    )
+
+
+def _wrap_errors(name: str):
+    """Log any failure of the wrapped coroutine and re-raise it as RuntimeError("<name> failed: ...")"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                logger.exception("%s failed: %s", name, e)
+                raise RuntimeError(f"{name} failed: {e}") from e
+        return wrapper
+    return decorator
+
+
+# Markdown code fences Gemini wraps around JSON, and the outermost JSON object in free text
+_CODE_FENCE_RE = re.compile(rb"```(?:json)?\n?")
+_JSON_BLOCK_RE = re.compile(r"\{[\s\S]*\}")
+
+
+def _parse_model_json(text: str) -> Any:
+    """Parse a model response as JSON, ignoring markdown code fences"""
+    return orjson.loads(_CODE_FENCE_RE.sub(b'', text.strip().encode()))
+
+
+# Fields extract_trip_info returns; anything else the model adds is dropped
+_TRIP_FIELDS = (
+    'start_location', 'end_location', 'earnings', 'fuel_cost', 'toll_cost',
+    'other_expenses', 'platform', 'trip_type', 'notes',
+)
+
+
+def _select_fields(data: Any, fields: tuple) -> Dict[str, Any]:
+    """Keep only the known fields of a parsed JSON object"""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return {k: data[k] for k in fields if k in data}
+
+
+# Numeric trip fields, normalised to float (0.0 when missing or invalid)
+_NUM_FIELDS = ('earnings', 'fuel_cost', 'toll_cost', 'other_expenses')
+
+
+def _coerce_floats(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce the numeric trip fields of data to float in place"""
+    for k in _NUM_FIELDS:
+        v = data.get(k)
+        try:
+            data[k] = float(v) if v is not None else 0.0
+        except (TypeError, ValueError):
+            data[k] = 0.0
+    return data
+
+
+def _to_json_text(obj: Any) -> str:
+    """Compact JSON rendering of prompt data (cheaper in tokens than a Python repr)"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _cache_key(*parts: Any) -> bytes:
+    """Stable digest of JSON-serialisable call arguments"""
+    payload = orjson.dumps(parts, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+# Shared pool for image preprocessing (Pillow releases the GIL while decoding/encoding)
+_IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="gemini-img")
+
+
+_MAX_IMAGE_SIZE = 1024
+
+# Pillow's default JPEG quality (4:2:0 subsampling), which uploads have always used
+_JPEG_QUALITY = 75
+
+# Baseline, extended sequential and progressive Huffman-coded frames
+_JPEG_SOF_MARKERS = (0xC0, 0xC1, 0xC2)
+# APP1 (Exif/XMP) and APP13 (IPTC) can carry GPS and device metadata
+_JPEG_METADATA_MARKERS = (0xE1, 0xED)
+
+
+def _is_small_jpeg(buf: bytes) -> bool:
+    """Check from the segment headers alone whether buf is a 3-component JPEG within
+    _MAX_IMAGE_SIZE with no Exif/XMP/IPTC metadata, so it can be sent on unchanged"""
+    if not buf.startswith(b"\xff\xd8\xff"):
+        return False
     
-    def __init__(self):
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        self.chat_model = genai.GenerativeModel(
-            settings.GEMINI_MODEL,
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-        )
+    i = 2
+    n = len(buf)
+    while i + 4 <= n:
+        if buf[i] != 0xFF:
+            return False
+        marker = buf[i + 1]
+        # Fill bytes and standalone markers carry no length
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        # Reached scan data or end of image without a frame header
+        if marker in (0xDA, 0xD9):
+            return False
+        # Metadata must be stripped by re-encoding before leaving the server
+        if marker in _JPEG_METADATA_MARKERS:
+            return False
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 10 > n:
+                return False
+            height = int.from_bytes(buf[i + 5:i + 7], "big")
+            width = int.from_bytes(buf[i + 7:i + 9], "big")
+            components = buf[i + 9]
+            return components == 3 and 0 < max(width, height) <= _MAX_IMAGE_SIZE
+        i += 2 + int.from_bytes(buf[i + 2:i + 4], "big")
+    return False
+
+
+# Worst-first ranking of the condition labels used in vehicle analyses
+_CONDITION_RANK = {
+    "none": 0, "good": 0,
+    "minor": 1, "fair": 1, "low": 1,
+    "moderate": 2, "poor": 2,
+    "severe": 3, "critical": 3,
+}
+_VEHICLE_CONDITION_FIELDS = (
+    "overall_health", "tire_condition", "engine_oil_level",
+    "brake_condition", "battery_health", "body_damage",
+)
+
+
+def _worst_condition(values: List[Any]) -> Any:
+    """Pick the most severe known condition label, if any"""
+    known = [v for v in values if isinstance(v, str) and v.lower() in _CONDITION_RANK]
+    if not known:
+        return next((v for v in values if v is not None), None)
+    return max(known, key=lambda v: _CONDITION_RANK[v.lower()])
+
+
+def _severity(result: Dict[str, Any]) -> float:
+    """severity_score as a float, 0.0 when missing or invalid"""
+    try:
+        return float(result.get("severity_score") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _as_list(value: Any) -> List[Any]:
+    """value if it is a list, otherwise an empty list"""
+    return value if isinstance(value, list) else []
+
+
+def _merge_vehicle_analyses(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-image vehicle analyses into one worst-case assessment"""
+    if len(results) == 1:
+        return results[0]
     
-    async def transcribe_audio(self, audio_data: bytes) -> str:
-        """Transcribe audio to text using Gemini"""
-        try:
-            logger = logging.getLogger(__name__)
-            logger.info("Transcribing audio of size %d", len(audio_data) if audio_data else 0)
-            # Gemini supports audio transcription
-            response = self.model.generate_content([
-                "Transcribe this audio message. The speaker is a ride-hailing or delivery driver reporting their trip details. Extract: start location, end location, earnings, expenses, and any other relevant trip information.",
-                {"mime_type": "audio/wav", "data": audio_data}
-            ])
-            logger.info("Transcription response received. Length=%d", len(response.text) if response and response.text else 0)
-            return response.text
-        except Exception as e:
-            logger = logging.getLogger(__name__)
-            logger.exception("Audio transcription failed: %s", str(e))
-            raise Exception(f"Audio transcription failed: {str(e)}")
+    worst = max(results, key=_severity)
+    merged: Dict[str, Any] = {
+        field: _worst_condition([r.get(field) for r in results])
+        for field in _VEHICLE_CONDITION_FIELDS
+    }
+    merged["severity_score"] = _severity(worst)
+    merged["detected_issues"] = [issue for r in results for issue in _as_list(r.get("detected_issues"))]
+    merged["immediate_action_required"] = any(r.get("immediate_action_required") for r in results)
+    merged["recommendations"] = list(dict.fromkeys(
+        rec for r in results for rec in _as_list(r.get("recommendations"))
+        if isinstance(rec, str)
+    ))
+    merged["estimated_cost_range"] = worst.get("estimated_cost_range")
+    check_days = [r["next_check_in_days"] for r in results if isinstance(r.get("next_check_in_days"), (int, float))]
+    merged["next_check_in_days"] = min(check_days) if check_days else None
+    return merged
+
+
+def _encode_image_vips(img_bytes: bytes) -> bytes:
+    """Shrink-on-load thumbnail and JPEG encode with libvips"""
+    img = pyvips.Image.thumbnail_buffer(img_bytes, _MAX_IMAGE_SIZE, size="down")
+    if img.hasalpha():
+        img = img.flatten(background=[255, 255, 255])
+    if img.interpretation != "srgb":
+        img = img.colourspace("srgb")
+    return img.jpegsave_buffer(Q=_JPEG_QUALITY, strip=True, subsample_mode="on")
+
+
+def _encode_image_pillow(img_bytes: bytes) -> bytes:
+    """Resize and JPEG encode with Pillow"""
+    img = Image.open(io.BytesIO(img_bytes))
+    # Convert to RGB if necessary
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
     
-    async def analyze_vehicle_images(
-        self, 
-        images: List[bytes],
-        context: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Analyze vehicle condition from images using Gemini Vision"""
+    # Resize if too large
+    if max(img.size) > _MAX_IMAGE_SIZE:
+        img.thumbnail((_MAX_IMAGE_SIZE, _MAX_IMAGE_SIZE), Image.Resampling.LANCZOS)
+    
+    # Convert back to bytes
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=_JPEG_QUALITY)
+    return img_byte_arr.getvalue()
+
+
+def _prep_image(img_bytes: bytes) -> Dict[str, Any]:
+    """Normalize an uploaded image to an RGB JPEG of at most 1024px"""
+    # Already a small colour JPEG: send it as-is instead of decoding and re-encoding
+    if _is_small_jpeg(img_bytes):
+        return {
+            "mime_type": "image/jpeg",
+            "data": img_bytes
+        }
+    
+    data = None
+    if pyvips is not None:
         try:
-            prompt = """You are an expert vehicle diagnostic AI. Analyze these vehicle images and provide a detailed health assessment.
+            data = _encode_image_vips(img_bytes)
+        except pyvips.Error:
+            data = None
+    if data is None:
+        data = _encode_image_pillow(img_bytes)
+    
+    return {
+        "mime_type": "image/jpeg",
+        "data": data
+    }
+
+
+# Static prompt text; per-call values are joined in between
+_VEHICLE_PROMPT = """You are an expert vehicle diagnostic AI. Analyze these vehicle images and provide a detailed health assessment.
 
 Focus on:
 1. Tire condition (tread depth, wear patterns, damage)
@@ -85,52 +299,13 @@ Provide your response in JSON format with:
     "estimated_cost_range": "₹500-1000",
     "next_check_in_days": 7
 }"""
-            
-            if context:
-                prompt += f"\n\nAdditional context: {context}"
-            
-            # Prepare image parts
-            image_parts = []
-            for img_bytes in images:
-                img = Image.open(io.BytesIO(img_bytes))
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = 1024
-                if max(img.size) > max_size:
-                    img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                
-                # Convert back to bytes
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='JPEG')
-                img_byte_arr = img_byte_arr.getvalue()
-                
-                image_parts.append({
-                    "mime_type": "image/jpeg",
-                    "data": img_byte_arr
-                })
-            
-            # Generate analysis
-            content = [prompt] + image_parts
-            response = self.model.generate_content(content)
-            
-            # Parse JSON response
-            import json
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            
-            return result
-        except Exception as e:
-            raise Exception(f"Vehicle image analysis failed: {str(e)}")
-    
-    async def extract_trip_info(self, transcription: str) -> Dict[str, Any]:
-        """Extract structured trip information from transcription"""
-        try:
-            prompt = f"""Extract trip information from this transcription: "{transcription}"
+
+_TRIP_PROMPT_HEAD = 'Extract trip information from this transcription: "'
+
+_TRIP_PROMPT_TAIL = """\"
 
 Extract and provide in JSON format:
-{{
+{
     "start_location": "location name",
     "end_location": "location name",
     "earnings": 0.0,
@@ -140,73 +315,50 @@ Extract and provide in JSON format:
     "platform": "uber/ola/swiggy/zomato/other",
     "trip_type": "ride_hailing/delivery/other",
     "notes": "any additional information"
-}}
+}
+
+If any field is not mentioned, use reasonable defaults or 0.0 for numbers."""
+
+# Each extracted trip is ~100-150 output tokens; 10 per call stays well under
+# the chat model's 2048 max_output_tokens
+_TRIP_BATCH_SIZE = 10
+
+_TRIP_BATCH_PROMPT_HEAD = """Extract trip information from each of these numbered transcriptions:
+
+"""
+
+_TRIP_BATCH_PROMPT_TAIL = """
+Return a JSON array with exactly one object per transcription, in the same order:
+[
+    {
+        "start_location": "location name",
+        "end_location": "location name",
+        "earnings": 0.0,
+        "fuel_cost": 0.0,
+        "toll_cost": 0.0,
+        "other_expenses": 0.0,
+        "platform": "uber/ola/swiggy/zomato/other",
+        "trip_type": "ride_hailing/delivery/other",
+        "notes": "any additional information"
+    }
+]
 
 If any field is not mentioned, use reasonable defaults or 0.0 for numbers."""
-            
-            response = self.chat_model.generate_content(prompt)
-            import json
-            response_text = response.text.strip()
-            # Try direct JSON parsing
-            try:
-                result = json.loads(response_text.replace('```json', '').replace('```', ''))
-                # Normalize numeric fields
-                for num_field in ['earnings', 'fuel_cost', 'toll_cost', 'other_expenses']:
-                    if num_field in result:
-                        try:
-                            result[num_field] = float(result[num_field]) if result[num_field] is not None else 0.0
-                        except Exception:
-                            result[num_field] = 0.0
-                return result
-            except Exception:
-                # Attempt to find a JSON block inside the text
-                json_match = re.search(r"\{[\s\S]*\}", response_text)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group(0))
-                        for num_field in ['earnings', 'fuel_cost', 'toll_cost', 'other_expenses']:
-                            if num_field in result:
-                                try:
-                                    result[num_field] = float(result[num_field]) if result[num_field] is not None else 0.0
-                                except Exception:
-                                    result[num_field] = 0.0
-                        return result
-                    except Exception:
-                        pass
-                # Fallback: log and return sensible default
-                logger = logging.getLogger(__name__)
-                logger.warning("Failed to parse JSON from Gemini extract_trip_info output: %s", response_text)
-                return {
-                    'start_location': None,
-                    'end_location': None,
-                    'earnings': 0.0,
-                    'fuel_cost': 0.0,
-                    'toll_cost': 0.0,
-                    'other_expenses': 0.0,
-                    'platform': None,
-                    'trip_type': 'ride_hailing',
-                    'notes': ''
-                }
-        except Exception as e:
-            raise Exception(f"Trip info extraction failed: {str(e)}")
-    
-    async def analyze_earnings_pattern(
-        self, 
-        trip_history: List[Dict[str, Any]],
-        user_context: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Analyze earnings patterns and provide insights"""
-        try:
-            prompt = f"""Analyze this driver's earnings pattern and provide actionable insights.
+
+_EARNINGS_PROMPT_HEAD = """Analyze this driver's earnings pattern and provide actionable insights.
 
 Trip History Summary:
-{trip_history}
+"""
+
+_EARNINGS_PROMPT_CONTEXT = """
 
 User Context:
-{user_context}
+"""
+
+_EARNINGS_PROMPT_TAIL = """
 
 Provide analysis in JSON format:
-{{
+{
     "total_earnings": 0.0,
     "average_earnings_per_trip": 0.0,
     "best_earning_hours": ["time slots"],
@@ -215,95 +367,328 @@ Provide analysis in JSON format:
     "recommendations": ["actionable recommendations"],
     "predicted_monthly_income": 0.0,
     "improvement_potential": "percentage or amount"
-}}"""
-            
-            response = self.chat_model.generate_content(prompt)
-            
-            import json
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            
-            return result
-        except Exception as e:
-            raise Exception(f"Earnings pattern analysis failed: {str(e)}")
-    
-    async def detect_fatigue(
-        self, 
-        work_pattern: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Detect worker fatigue from work patterns"""
-        try:
-            prompt = f"""Analyze this work pattern to detect fatigue and burnout risk:
+}"""
+
+_FATIGUE_PROMPT_HEAD = """Analyze this work pattern to detect fatigue and burnout risk:
+
+"""
 
-{work_pattern}
+_FATIGUE_PROMPT_TAIL = """
 
 Provide analysis in JSON format:
-{{
+{
     "fatigue_level": "low/moderate/high/critical",
     "risk_score": 0-100,
     "warning_signs": ["list of detected warning signs"],
     "recommendations": ["rest recommendations"],
     "suggested_break_duration": "hours",
     "health_tips": ["tips for recovery"]
-}}"""
-            
-            response = self.chat_model.generate_content(prompt)
-            
-            import json
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            
-            return result
-        except Exception as e:
-            raise Exception(f"Fatigue detection failed: {str(e)}")
-    
-    async def generate_financial_plan(
-        self,
-        user_profile: Dict[str, Any],
-        goals: List[Dict[str, Any]],
-        current_finances: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Generate personalized financial plan"""
-        try:
-            prompt = f"""Create a personalized financial plan for this user:
+}"""
+
+_FINANCIAL_PROMPT_HEAD = """Create a personalized financial plan for this user:
 
 User Profile:
-{user_profile}
+"""
+
+_FINANCIAL_PROMPT_GOALS = """
 
 Financial Goals:
-{goals}
+"""
+
+_FINANCIAL_PROMPT_FINANCES = """
 
 Current Financial Situation:
-{current_finances}
+"""
+
+_FINANCIAL_PROMPT_TAIL = """
 
 Provide a comprehensive plan in JSON format:
-{{
-    "monthly_budget": {{
+{
+    "monthly_budget": {
         "income": 0.0,
         "essential_expenses": 0.0,
         "savings": 0.0,
         "investments": 0.0,
         "discretionary": 0.0
-    }},
+    },
     "goal_allocation": [
-        {{
+        {
             "goal_name": "name",
             "monthly_amount": 0.0,
             "priority": "high/medium/low"
-        }}
+        }
     ],
     "investment_recommendations": ["recommendations"],
     "action_steps": ["ordered list of steps"],
     "timeline": "estimated time to achieve goals",
     "risk_assessment": "analysis of financial risks"
-}}"""
-            
-            response = self.chat_model.generate_content(prompt)
-            
-            import json
-            result = json.loads(response.text.strip().replace('```json', '').replace('```', ''))
-            
+}"""
+
+
+class GeminiService:
+    """Service for interacting with Google Gemini AI"""
+    
+    def __init__(self):
+        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.chat_model = genai.GenerativeModel(
+            settings.GEMINI_MODEL,
+            generation_config={
+                "temperature": 0.7,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            }
+        )
+        # Drivers often retry identical uploads; reuse recent extractions/analyses
+        self._trip_cache: Optional[TTLCache] = None
+        self._earnings_cache: Optional[TTLCache] = None
+        if settings.GEMINI_CACHE_ENABLED:
+            self._trip_cache = TTLCache(maxsize=settings.GEMINI_CACHE_SIZE, ttl=settings.GEMINI_CACHE_TTL)
+            self._earnings_cache = TTLCache(maxsize=settings.GEMINI_CACHE_SIZE, ttl=settings.GEMINI_CACHE_TTL)
+    
+    async def warm_up(self) -> None:
+        """Open the shared Gemini channel ahead of the first user request"""
+        # count_tokens is a cheap RPC that forces the cached async client to connect
+        await self.model.count_tokens_async("ping")
+    
+    @_with_backoff()
+    async def _generate(self, model: genai.GenerativeModel, content: Any, **kwargs) -> Any:
+        """Run a generate_content call without blocking the event loop
+        
+        The semaphore is taken per attempt, so backoff sleeps never hold an in-flight slot.
+        """
+        async with _GEMINI_SEM:
+            return await model.generate_content_async(content, **kwargs)
+    
+    @_wrap_errors("Audio transcription")
+    async def transcribe_audio(self, audio_data: bytes) -> str:
+        """Transcribe audio to text using Gemini"""
+        logger.info("Transcribing audio of size %d", len(audio_data) if audio_data else 0)
+        # Gemini supports audio transcription
+        response = await self._generate(self.model, [
+            "Transcribe this audio message. The speaker is a ride-hailing or delivery driver reporting their trip details. Extract: start location, end location, earnings, expenses, and any other relevant trip information.",
+            {"mime_type": "audio/wav", "data": audio_data}
+        ])
+        logger.info("Transcription response received. Length=%d", len(response.text) if response and response.text else 0)
+        return response.text
+    
+    @_wrap_errors("Vehicle image analysis")
+    async def analyze_vehicle_images(
+        self, 
+        images: List[bytes],
+        context: Optional[str] = None,
+        preprocessed: bool = False
+    ) -> Dict[str, Any]:
+        """Analyze vehicle condition from images using Gemini Vision
+        
+        Set preprocessed when the client claims to have sent JPEGs of at most 1024px
+        (X-Image-Preprocessed header). Each image is still checked with _is_small_jpeg;
+        those that pass skip the preprocessing pool, the rest are normalized as usual.
+        """
+        prompt = _VEHICLE_PROMPT
+        
+        if context:
+            prompt += f"\n\nAdditional context: {context}"
+        
+        # Prepare image parts in parallel off the event loop
+        image_parts = await asyncio.gather(
+            *(self._prepare_image_part(img_bytes, preprocessed) for img_bytes in images)
+        )
+        
+        # Analyze each image concurrently and merge into one assessment
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self._analyze_single(prompt, part)) for part in image_parts]
+        
+        results = [result for result in (task.result() for task in tasks) if result is not None]
+        if not results:
+            raise ValueError("no image could be analyzed")
+        
+        return _merge_vehicle_analyses(results)
+    
+    async def _prepare_image_part(self, img_bytes: bytes, preprocessed: bool) -> Dict[str, Any]:
+        """Image part for Gemini, verifying client-preprocessed images before trusting them"""
+        if preprocessed and _is_small_jpeg(img_bytes):
+            return {"mime_type": "image/jpeg", "data": img_bytes}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_IMAGE_EXECUTOR, _prep_image, img_bytes)
+    
+    async def _analyze_single(self, prompt: str, image_part: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Analyze one vehicle image, returning None if the call or parse fails"""
+        try:
+            response = await self._generate(self.model, [prompt, image_part])
+            result = _parse_model_json(response.text)
+            if not isinstance(result, dict):
+                raise ValueError("Expected a JSON object")
             return result
         except Exception as e:
-            raise Exception(f"Financial plan generation failed: {str(e)}")
+            logger.warning("Single vehicle image analysis failed: %s", str(e))
+            return None
+    
+    @_wrap_errors("Trip info extraction")
+    async def extract_trip_info(self, transcription: str) -> Dict[str, Any]:
+        """Extract structured trip information from transcription"""
+        return await self._extract_trip_info(transcription)
+    
+    async def _extract_trip_info(self, transcription: str) -> Dict[str, Any]:
+        """extract_trip_info without error wrapping, for reuse by the batch path"""
+        cache_key = None
+        if self._trip_cache is not None:
+            cache_key = _cache_key(transcription)
+            cached = self._trip_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+        
+        prompt = "".join((_TRIP_PROMPT_HEAD, transcription, _TRIP_PROMPT_TAIL))
+        
+        response = await self._generate(self.chat_model, prompt)
+        response_text = response.text.strip()
+        result = None
+        # Try direct JSON parsing
+        try:
+            result = _select_fields(_parse_model_json(response_text), _TRIP_FIELDS)
+        except Exception:
+            # Attempt to find a JSON block inside the text
+            json_match = _JSON_BLOCK_RE.search(response_text)
+            if json_match:
+                try:
+                    result = _select_fields(orjson.loads(json_match.group(0)), _TRIP_FIELDS)
+                except Exception:
+                    pass
+        
+        if result is None:
+            # Fallback: log and return sensible default
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("Failed to parse JSON from Gemini extract_trip_info output: %s", response_text[:512])
+            return {
+                'start_location': None,
+                'end_location': None,
+                'earnings': 0.0,
+                'fuel_cost': 0.0,
+                'toll_cost': 0.0,
+                'other_expenses': 0.0,
+                'platform': None,
+                'trip_type': 'ride_hailing',
+                'notes': ''
+            }
+        
+        _coerce_floats(result)
+        if cache_key is not None:
+            self._trip_cache[cache_key] = dict(result)
+        return result
+    
+    @_wrap_errors("Batch trip info extraction")
+    async def extract_trip_info_batch(self, transcriptions: List[str]) -> List[Dict[str, Any]]:
+        """Extract trip information for several transcriptions, batching uncached ones into few Gemini calls"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(transcriptions)
+        pending = list(range(len(transcriptions)))
+        if self._trip_cache is not None:
+            pending = []
+            for i, transcription in enumerate(transcriptions):
+                cached = self._trip_cache.get(_cache_key(transcription))
+                if cached is not None:
+                    results[i] = dict(cached)
+                else:
+                    pending.append(i)
+        
+        # Chunk so each reply fits in the chat model's max_output_tokens
+        chunks = [pending[i:i + _TRIP_BATCH_SIZE] for i in range(0, len(pending), _TRIP_BATCH_SIZE)]
+        extracted = await asyncio.gather(
+            *(self._extract_trip_chunk([transcriptions[i] for i in chunk]) for chunk in chunks)
+        )
+        for chunk, chunk_results in zip(chunks, extracted):
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+        return results
+    
+    async def _extract_trip_chunk(self, transcriptions: List[str]) -> List[Dict[str, Any]]:
+        """Extract up to _TRIP_BATCH_SIZE trips with one Gemini call"""
+        if len(transcriptions) == 1:
+            return [await self._extract_trip_info(transcriptions[0])]
+        
+        numbered = "".join(f'{i}. "{t}"\n' for i, t in enumerate(transcriptions, 1))
+        prompt = "".join((_TRIP_BATCH_PROMPT_HEAD, numbered, _TRIP_BATCH_PROMPT_TAIL))
+        
+        response = await self._generate(self.chat_model, prompt)
+        
+        try:
+            items = _parse_model_json(response.text)
+            if not isinstance(items, list) or len(items) != len(transcriptions):
+                raise ValueError("batch result does not match the number of transcriptions")
+            results = [_select_fields(item, _TRIP_FIELDS) for item in items]
+        except Exception:
+            # Fall back to one call per transcription
+            logger.warning("Batch trip extraction mismatch; extracting %d trips individually", len(transcriptions))
+            return list(await asyncio.gather(*(self._extract_trip_info(t) for t in transcriptions)))
+        
+        for transcription, result in zip(transcriptions, results):
+            _coerce_floats(result)
+            if self._trip_cache is not None:
+                self._trip_cache[_cache_key(transcription)] = dict(result)
+        return results
+    
+    @_wrap_errors("Earnings pattern analysis")
+    async def analyze_earnings_pattern(
+        self, 
+        trip_history: List[Dict[str, Any]],
+        user_context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Analyze earnings patterns and provide insights"""
+        cache_key = None
+        if self._earnings_cache is not None:
+            cache_key = _cache_key(trip_history, user_context)
+            cached = self._earnings_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+        
+        prompt = "".join((
+            _EARNINGS_PROMPT_HEAD, _to_json_text(trip_history),
+            _EARNINGS_PROMPT_CONTEXT, _to_json_text(user_context),
+            _EARNINGS_PROMPT_TAIL,
+        ))
+        
+        response = await self._generate(self.chat_model, prompt)
+        
+        result = _parse_model_json(response.text)
+        
+        if cache_key is not None and isinstance(result, dict):
+            self._earnings_cache[cache_key] = dict(result)
+        
+        return result
+    
+    @_wrap_errors("Fatigue detection")
+    async def detect_fatigue(
+        self, 
+        work_pattern: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Detect worker fatigue from work patterns"""
+        prompt = "".join((_FATIGUE_PROMPT_HEAD, _to_json_text(work_pattern), _FATIGUE_PROMPT_TAIL))
+        
+        response = await self._generate(self.chat_model, prompt)
+        
+        result = _parse_model_json(response.text)
+        
+        return result
+    
+    @_wrap_errors("Financial plan generation")
+    async def generate_financial_plan(
+        self,
+        user_profile: Dict[str, Any],
+        goals: List[Dict[str, Any]],
+        current_finances: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Generate personalized financial plan"""
+        prompt = "".join((
+            _FINANCIAL_PROMPT_HEAD, _to_json_text(user_profile),
+            _FINANCIAL_PROMPT_GOALS, _to_json_text(goals),
+            _FINANCIAL_PROMPT_FINANCES, _to_json_text(current_finances),
+            _FINANCIAL_PROMPT_TAIL,
+        ))
+        
+        response = await self._generate(self.chat_model, prompt)
+        
+        result = _parse_model_json(response.text)
+        
+        return result
 
 
 # Singleton instance